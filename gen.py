@@ -59,15 +59,23 @@
 import sys
 import os
 import re
+import io
+import functools
+import mmap
+import array
+import collections
+import copyreg
+import pickle
 import clang.cindex
 from clang.cindex import CursorKind as CK
 from clang.cindex import TokenKind as TK
 from clang.cindex import TypeKind as TyK
+from clang.cindex import TranslationUnit
 import datetime
 import pprint
 
 # Functions/types to skip during generation by name.
-skip_names = [
+skip_names = frozenset([
     "SetAllocatorFunctions",
     "MemAlloc",
     "MemFree",
@@ -81,10 +89,10 @@ skip_names = [
     "ImFontGlyphRangesBuilder_BuildRanges",
     "GetTexID",
     "ImTextureData_GetTexRef",
-]
+])
 
 # Functions/types to skip during generation using their Unique Symbol Resolution (USR) identifier from clang.
-skip_usrs = [
+skip_usrs = frozenset([
     # we have custom replacements:
     "c:@N@ImGui@F@CreateContext#*$@S@ImFontAtlas#",
     "c:@N@ImGui@F@DestroyContext#*$@S@ImGuiContext#",
@@ -100,73 +108,311 @@ skip_usrs = [
     "c:@S@ImFontAtlas@F@GetCustomRectByIndex#I#1",  # Lua does not know about the nested datatype
     "c:@S@ImFontAtlas@F@CalcCustomRectUV#*1$@S@ImFontAtlas@S@CustomRect#*$@S@ImVec2#S2_#",  # Lua does not know about the nested datatype
     "c:@S@ImFontGlyphRangesBuilder@F@BuildRanges#*$@S@ImVector>#s#",  # Template parameter in function
-]
+])
 
 # Structs for which constructor generation should be skipped.
-skip_constructors = ["ImGuiTextFilter", "ImDrawList"]
+skip_constructors = frozenset(["ImGuiTextFilter", "ImDrawList"])
 
 # Flag to enable/disable debug information in generated files.
 debug = False
 
 # do not change below
 
-# Caches file contents to avoid reading the same file multiple times.
+# Only declarations are of interest, so have clang skip parsing the bodies of inline functions.
+tu_parse_options = TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+
+# clang's kind enumerations compare by identity. Make unpickled AstNodes (e.g. from the AST cache)
+# refer to the registered instances again instead of copies.
+copyreg.pickle(CK, lambda k: (CK.from_id, (k.value,)))
+copyreg.pickle(TyK, lambda k: (TyK.from_id, (k.value,)))
+copyreg.pickle(TK, lambda k: (TK.from_value, (k.value,)))
+
+# File in the output directory caching the AstNode tree between runs, see loadAstCache().
+# Set the environment variable IMGUIGEN_NO_CACHE=1 to always parse the header.
+ast_cache_file = ".ast_cache.pkl"
+
+# File remembering the libclang found on Linux, see findLibclang().
+libclang_path_cache = os.path.join(os.path.expanduser("~"), ".cache", "imguiluagen", "libclang_path")
+
+# Cursor kinds of the functions the generators wrap.
+function_kinds = frozenset([CK.FUNCTION_DECL, CK.CXX_METHOD, CK.CONSTRUCTOR])
+
+# Cursor kinds of the functions wrapped under their own name, i.e. without constructors.
+named_function_kinds = frozenset([CK.FUNCTION_DECL, CK.CXX_METHOD])
+
+# Cursor kinds of the structs and unions.
+record_kinds = frozenset([CK.STRUCT_DECL, CK.UNION_DECL])
+
+# Cursor kinds of the non function declarations bindings are generated for.
+type_decl_kinds = frozenset([CK.TYPEDEF_DECL, CK.STRUCT_DECL, CK.UNION_DECL, CK.ENUM_DECL])
+
+# Cursor kinds holding the declarations, their children are walked instead of generated.
+container_kinds = frozenset([CK.TRANSLATION_UNIT, CK.NAMESPACE])
+
+# Cursor kinds whose name prefixes the names of the functions within when detecting overloads.
+overload_scope_kinds = frozenset([CK.TRANSLATION_UNIT, CK.NAMESPACE, CK.STRUCT_DECL])
+
+# Cursor kinds of templates, nothing is generated for them.
+template_kinds = frozenset([CK.CLASS_TEMPLATE, CK.FUNCTION_TEMPLATE])
+
+# Caches memory mapped source files and their line offsets to avoid reading the same file multiple times.
 fileCache = {}
 
+# Parameter names that need to be renamed as they are reserved in Lua.
+reserved_lua_keywords = frozenset([
+    "and", "break", "do", "else", "elseif", "end",
+    "false", "for", "function", "if", "in", "local",
+    "nil", "not", "or", "repeat", "return", "then",
+    "true", "until", "while",
+])
+
+# Qualifiers, spaces and pointer/reference marks that are dropped from a type for the Lua parameter name prefix.
+simple_type_strip_re = re.compile(r"const |unsigned |[ *&]")
+
+# ImVec2/ImVec4 as whole words, the FFI header uses ImVec2_C/ImVec4_C instead.
+imvec_re = re.compile(r"\bImVec[24]\b")
+
+# Splits a type spelling into the plain type and what follows it: an array suffix, template arguments or a function pointer.
+type_shape_re = re.compile(r"(?P<base>[^<\[(]*)(?:(?P<arr>\[.*)|(?P<tmpl><)|(?P<fptr>\(\*\)))?")
+
+
+class AstNode:
+    """
+    Snapshot of a clang cursor holding plain python data only.
+    Every property access on a cursor is a call into libclang, so the ones the generators
+    need are read exactly once here and kept as attributes. Kind specific details are only
+    read for the kinds that use them and are None otherwise. As there are no references to
+    libclang objects, a tree can be pickled, e.g. to cache it between runs.
+    """
+    __slots__ = (
+        "kind", "spelling", "usr", "type_spelling", "filename", "extent", "children",
+        # PARM_DECL/FIELD_DECL
+        "type_kind", "canonical_type_kind", "hash",
+        # FUNCTION_DECL/CXX_METHOD/CONSTRUCTOR
+        "result_type_spelling", "result_type_resolved_spelling", "is_variadic", "param_tokens",
+        # STRUCT_DECL/UNION_DECL
+        "is_definition",
+        # ENUM_DECL
+        "enum_type_spelling",
+    )
+
+    def __init__(self, c):
+        self.kind = c.kind
+        self.spelling = c.spelling
+        self.usr = c.get_usr()
+        self.type_spelling = c.type.spelling
+        self.filename = c.location.file.name if c.location.file else None
+        self.extent = None
+        self.children = []
+        self.type_kind = None
+        self.canonical_type_kind = None
+        self.hash = None
+        self.result_type_spelling = None
+        self.result_type_resolved_spelling = None
+        self.is_variadic = None
+        self.param_tokens = None
+        self.is_definition = None
+        self.enum_type_spelling = None
+
+    def readDetails(self, c, withExtent):
+        """Reads the kind specific properties of the cursor, and its extent if asked for."""
+        if withExtent or self.kind == CK.ENUM_CONSTANT_DECL:
+            self.extent = getExtent(c)
+        if self.kind == CK.PARM_DECL or self.kind == CK.FIELD_DECL:
+            t = c.type
+            self.type_kind = t.kind
+            self.canonical_type_kind = t.get_canonical().kind
+            # only used to name unnamed parameters
+            if not self.spelling:
+                self.hash = c.hash
+        elif self.kind in function_kinds:
+            rt = c.result_type
+            self.result_type_spelling = rt.spelling
+            # the spelling of the type behind a typedef, e.g. ImVec2 for a typedef'd ImVec2
+            self.result_type_resolved_spelling = rt.get_canonical().spelling if rt.kind == TyK.TYPEDEF else rt.spelling
+            self.is_variadic = c.type.is_function_variadic()
+        elif self.kind in record_kinds:
+            self.is_definition = c.is_definition()
+        elif self.kind == CK.ENUM_DECL:
+            self.enum_type_spelling = c.enum_type.get_canonical().spelling
+
+    def arguments(self):
+        """Returns the parameter nodes of a function node."""
+        return [ch for ch in self.children if ch.kind == CK.PARM_DECL]
+
+    def hasDefaultArguments(self):
+        """Returns True if a parameter of the function node has a default argument, which shows as an expression child."""
+        return any(ch.kind.is_expression() for p in self.arguments() for ch in p.children)
+
+
+def build_ast(c, sFilename, isDeclaration=False):
+    """
+    Builds the AstNode tree for a cursor in a single pre-order walk.
+    Cursors located in other files than sFilename (e.g. system headers) are kept as leaves,
+    nothing gets generated for them so there is no need to walk their children or read details.
+    The extent is read for declarations (children of the translation unit or a namespace) and
+    enum constants only, as those are the nodes the generators take source text from.
+    """
+    node = AstNode(c)
+    if not node.filename or node.filename.endswith(sFilename):
+        node.readDetails(c, isDeclaration)
+        isContainer = node.kind in container_kinds
+        node.children = [build_ast(cn, sFilename, isContainer) for cn in c.get_children()]
+        if node.kind in function_kinds:
+            # the tokens are only used to read default arguments, most functions don't have any
+            node.param_tokens = getParameterTokens(c) if node.hasDefaultArguments() else []
+    return node
+
+
+def getClangVersion():
+    """Returns the version string of the loaded libclang, e.g. 'clang version 18.1.1'."""
+    getVersion = clang.cindex.conf.lib.clang_getClangVersion
+    # not wrapped by the python bindings, declared the way they declare their own string functions
+    getVersion.restype = clang.cindex._CXString
+    getVersion.errcheck = clang.cindex._CXString.from_result
+    return getVersion()
+
+
+def getAstCacheKey(sourceFiles):
+    """Returns what a cached AstNode tree depends on: the parsed files, libclang and this script."""
+    return (
+        tuple((f, os.path.getmtime(f)) for f in sourceFiles),
+        getClangVersion(),
+        os.path.getmtime(os.path.realpath(__file__)),
+    )
+
+
+def loadAstCache(cachePath, sFilename):
+    """Returns the cached AstNode tree of sFilename, or None if there is none or it is outdated."""
+    try:
+        with open(cachePath, "rb") as f:
+            sourceFiles, key, root = pickle.load(f)
+        if sourceFiles[0] == sFilename and getAstCacheKey(sourceFiles) == key:
+            return root
+    except Exception:
+        # missing, unreadable or outdated in a way that breaks unpickling, parse again
+        pass
+    return None
+
+
+def saveAstCache(cachePath, sourceFiles, root):
+    """Stores an AstNode tree along with the key it stays valid for. sourceFiles starts with the parsed header."""
+    try:
+        with open(cachePath, "wb") as f:
+            pickle.dump((sourceFiles, getAstCacheKey(sourceFiles), root), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        print(f"Warning: Could not write the AST cache: {e}")
+
+
+def getExtent(c):
+    """Returns the extent of a cursor as (filename, start line, start column, end line, end column)."""
+    extent = c.extent
+    start = extent.start
+    end = extent.end
+    return (start.file.name if start.file else None, start.line, start.column, end.line, end.column)
+
+
+def getParameterTokens(c):
+    """
+    Returns (kind, spelling) of the tokens of a function from its first parameter on.
+    The return type is of no interest. The range ends with the function and not with the last
+    parameter, as clang cuts a parameter's extent short when its default argument does not resolve
+    (e.g. NULL without the builtin headers). Readers stop at the closing ')' of the parameter list.
+    """
+    arguments = list(c.get_arguments())
+    if not arguments:
+        return []
+    paramExtent = clang.cindex.SourceRange.from_locations(arguments[0].extent.start, c.extent.end)
+    return [(t.kind, t.spelling) for t in c.translation_unit.get_tokens(extent=paramExtent)]
+
+
+def isSkipped(c):
+    """Returns True if a node is excluded from generation by the skip lists or is a template."""
+    return c.usr in skip_usrs or c.spelling in skip_names or c.kind in template_kinds
+
+
+def isGeneratableFunction(c):
+    """Returns True if a node is a (member) function that gets wrapped by the generators."""
+    return c.kind in named_function_kinds and c.spelling.find("operator") == -1 and not isSkipped(c)
+
+
+def writeFile(filename, text):
+    """
+    Writes text as utf-8 to a file with a single encode and raw os.write calls,
+    bypassing the buffered text layer. Newlines are written the platform's way like text mode does.
+    """
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    data = memoryview(text.encode("utf-8"))
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data) :]
+    finally:
+        os.close(fd)
+
 
 def dumpCursor(c, level):
-    """Recursively prints the details of a clang cursor for debugging."""
+    """Recursively prints the details of an AstNode tree for debugging."""
     print(
         " " * level,
         str(c.kind)[str(c.kind).index(".") + 1 :],
-        c.type.spelling,
+        c.type_spelling,
         c.spelling,
     )
     print(" " * level, "  ", getContent(c, True))
-    for cn in c.get_children():
+    for cn in c.children:
         dumpCursor(cn, level + 1)
 
 
 def getContent(c, shortOnly):
     """
-    Extracts the source code text corresponding to a clang cursor.
+    Extracts the source code text corresponding to an AstNode.
     
     Args:
-        c: The clang cursor.
+        c: The AstNode, its extent must have been read.
         shortOnly (bool): If True, returns '<>' for multi-line content.
     
     Returns:
         The source text as a string.
     """
     global fileCache
-    filename = str(c.extent.start.file)
-    if filename == "None":
+    if c.extent is None:
+        return ""
+    filename, startLine, startColumn, endLine, endColumn = c.extent
+    if filename is None:
         return ""
     if not filename in fileCache:
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                fileCache[filename] = f.readlines()
-        except (FileNotFoundError, UnicodeDecodeError):
+            with open(filename, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty files can not be mapped
             return ""
-
-    fileContent = fileCache[filename]
+        # byte offset of every line start, the last entry marks the end of the file
+        lineOffsets = array.array("i", [0])
+        pos = mm.find(b"\n")
+        while pos != -1:
+            lineOffsets.append(pos + 1)
+            pos = mm.find(b"\n", pos + 1)
+        if lineOffsets[-1] != len(mm):
+            lineOffsets.append(len(mm))
+        fileCache[filename] = (mm, lineOffsets)
+
+    mm, lineOffsets = fileCache[filename]
     # too long?
-    if shortOnly and c.extent.start.line != c.extent.end.line:
+    if shortOnly and startLine != endLine:
         return "<>"
-    # fiddle out the content
-    res = ""
-    for i in range(c.extent.start.line - 1, c.extent.end.line):
-        if i >= len(fileContent):
-            continue
-        if i == c.extent.start.line - 1 and i == c.extent.end.line - 1:
-            res += fileContent[i][c.extent.start.column - 1 : c.extent.end.column - 1]
-        elif i == c.extent.start.line - 1:
-            res += fileContent[i][c.extent.start.column - 1 :]
-        elif i == c.extent.end.line - 1:
-            res += fileContent[i][: c.extent.end.column - 1]
-        else:
-            res += fileContent[i]
-    return res.strip()
+    # fiddle out the content, clang columns are byte offsets into the line
+    lineCount = len(lineOffsets) - 1
+    if startLine > lineCount:
+        return ""
+    first = lineOffsets[startLine - 1] + startColumn - 1
+    last = lineOffsets[endLine - 1] + endColumn - 1 if endLine <= lineCount else len(mm)
+    try:
+        res = mm[first:last].decode("utf-8")
+    except UnicodeDecodeError:
+        return ""
+    return res.replace("\r\n", "\n").strip()
 
 
 def luaParameterSpelling(c, addSimpleType):
@@ -175,53 +421,70 @@ def luaParameterSpelling(c, addSimpleType):
     Optionally prefixes the name with a simplified type for clarity in the Lua API.
     
     Args:
-        c: The clang cursor for the parameter.
+        c: The AstNode of the parameter.
         addSimpleType (bool): Whether to add the type prefix.
         
     Returns:
         The sanitized parameter name.
     """
-    reserved_lua_keywords = {
-        "and": 1, "break": 1, "do": 1, "else": 1, "elseif": 1, "end": 1,
-        "false": 1, "for": 1, "function": 1, "if": 1, "in": 1, "local": 1,
-        "nil": 1, "not": 1, "or": 1, "repeat": 1, "return": 1, "then": 1,
-        "true": 1, "until": 1, "while": 1,
-    }
     parName = c.spelling
     if not parName:
-        return f"unnamed_arg_{hash(c)}"
+        return f"unnamed_arg_{c.hash}"
     if parName in reserved_lua_keywords:
         return "_" + parName
 
     # add the type to the var name as helper for lua users
     if addSimpleType:
-        simpletype = c.type.spelling
-        if simpletype.find("(*)") >= 0:
-            simpletype = "functionPtr"
-        else:
-            if simpletype.find("[") >= 0:
-                simpletype = simpletype[: simpletype.find("[")].strip() + "Ptr"
-            simpletype = simpletype.replace("const ", "")
-            simpletype = simpletype.replace("unsigned ", "")
-            simpletype = simpletype.replace(" ", "")
-            simpletype = simpletype.replace("*", "")
-            simpletype = simpletype.replace("&", "")
-            if simpletype == "char":
-                simpletype = "string"
-            if simpletype == "ImTextureRef":
-                simpletype = "ImTextureID"
-        return simpletype + "_" + parName
+        return luaSimpleType(c.type_spelling) + "_" + parName
     else:
         return parName
 
 
+@functools.lru_cache(maxsize=None)
+def luaSimpleType(type_str):
+    """Returns the simplified type used as Lua parameter name prefix, e.g. 'const char *' -> 'string'."""
+    if type_str.find("(*)") >= 0:
+        return "functionPtr"
+    simpletype = type_str
+    arrPos = simpletype.find("[")
+    if arrPos >= 0:
+        simpletype = simpletype[:arrPos].strip() + "Ptr"
+    simpletype = simple_type_strip_re.sub("", simpletype)
+    if simpletype == "char":
+        simpletype = "string"
+    if simpletype == "ImTextureRef":
+        simpletype = "ImTextureID"
+    return simpletype
+
+
+@functools.lru_cache(maxsize=None)
+def cTypeStr(type_str, is_ffi_header):
+    """Maps a clang type spelling to the type used in the generated C code."""
+    # Special handling for ImTextureRef to pass it as ImTextureID (ImU64) through FFI
+    if type_str == "ImTextureRef":
+        type_str = "ImTextureID"
+
+    # Conditionally replace types ONLY for the FFI header file
+    if is_ffi_header:
+        type_str = ffiTypeStr(type_str)
+    return type_str
+
+
+@functools.lru_cache(maxsize=None)
+def ffiTypeStr(type_str):
+    """Replaces ImVec2/ImVec4 in a type spelling with the ImVec2_C/ImVec4_C structs the FFI header declares."""
+    if "ImVec" in type_str:
+        type_str = imvec_re.sub(r"\g<0>_C", type_str)
+    return type_str
+
+
 def getCVarStr(c, addSimpleType, is_ffi_header=False):
     """
     Constructs a C-style variable declaration string (e.g., "int my_var") from a cursor.
     Handles special type replacements for FFI compatibility.
 
     Args:
-        c: The clang cursor for the variable/parameter.
+        c: The AstNode of the variable/parameter.
         addSimpleType (bool): Passed to luaParameterSpelling for name generation.
         is_ffi_header (bool): If True, replaces ImVec2/ImVec4 with their _C counterparts.
     
@@ -229,28 +492,16 @@ def getCVarStr(c, addSimpleType, is_ffi_header=False):
         A C variable declaration string.
     """
     res = ""
-    # Special handling for ImTextureRef to pass it as ImTextureID (ImU64) through FFI
-    if c.type.spelling == "ImTextureRef":
-        type_str = "ImTextureID"
-    else:
-        type_str = c.type.spelling
-
-    # Conditionally replace types ONLY for the FFI header file
-    if is_ffi_header:
-        if "ImVec2" in type_str:
-            type_str = type_str.replace("ImVec2", "ImVec2_C")
-        if "ImVec4" in type_str:
-            type_str = type_str.replace("ImVec4", "ImVec4_C")
-
+    type_str = cTypeStr(c.type_spelling, is_ffi_header)
     param_spelling = luaParameterSpelling(c, addSimpleType)
 
-    if type_str.find("[") >= 0:
-        typeWithOutArr = type_str[: type_str.find("[")].strip()
-        arrOnly = type_str[type_str.find("[") :]
-        res = typeWithOutArr + " " + param_spelling + arrOnly
-    elif type_str.find("<") >= 0:
-        res = type_str[: type_str.find("<")].strip() + " " + param_spelling
-    elif type_str.find("(*)") >= 0:
+    # split into the plain type and an array suffix/template arguments/function pointer in one scan
+    m = type_shape_re.match(type_str)
+    if m.group("arr"):
+        res = m.group("base").strip() + " " + param_spelling + m.group("arr")
+    elif m.group("tmpl"):
+        res = m.group("base").strip() + " " + param_spelling
+    elif m.group("fptr"):
         res = type_str.replace("(*)", "(*" + param_spelling + ")")
     else:
         res = type_str + " " + param_spelling
@@ -282,68 +533,90 @@ def luaifyValueWithType(p, s):
     Converts a C default value string into its Lua equivalent based on the parameter's type.
     
     Args:
-        p: The clang cursor for the parameter.
+        p: The AstNode of the parameter.
         s (str): The C default value string.
         
     Returns:
         The Lua equivalent value string.
     """
-    t = p.type
-    k = t.kind
+    k = p.type_kind
 
     # Resolve ELABORATED (e.g., 'enum MyEnum') and TYPEDEF types down to their
-    # canonical (underlying) type before processing.
-    while k == TyK.ELABORATED or k == TyK.TYPEDEF:
-        t = t.get_canonical()
-        k = t.kind
+    # canonical (underlying) type before processing. The canonical type is never
+    # a typedef itself, so one step is enough.
+    if k == TyK.ELABORATED or k == TyK.TYPEDEF:
+        k = p.canonical_type_kind
+
+    handler = luaify_handlers.get(k)
+    if handler:
+        return handler(s)
+    print(f"unknown value type:  {k} {s}  ### parent =  {p.type_spelling}  {p.spelling}")
+    return s
 
-    if k == TyK.BOOL:
-        return s
-    elif (
-        k == TyK.INT
-        or k == TyK.UINT
-        or k == TyK.ENUM
-        or k == TyK.LONGLONG
-        or k == TyK.ULONGLONG
-    ):
-        s = s.replace("+", "")
-        if s.startswith("Im"):
-            # Split by | and handle each part for flags
-            parts = [part.strip() for part in s.split("|")]
-            lua_parts = []
-            for part in parts:
-                if part.startswith("Im"):
-                    lua_parts.append("M." + part)
-                else:
-                    lua_parts.append(part)
-            s = " | ".join(lua_parts)
-        if s.startswith("sizeof"):
-            s = "ffi.sizeof('" + stripSizeOf(s) + "')"
-        return s
-    elif k == TyK.FLOAT or k == TyK.DOUBLE:
-        if "FLT_MAX" in s:
-            return "math.huge"
-        if "FLT_MIN" in s:
-            return "-FLT_MIN"
-        return s.replace("+", "").replace("f", "")
-    elif (k == TyK.POINTER) and (s == "nullptr" or s == "NULL"):
+
+def luaifyIntValue(s):
+    """Converts an integer/enum/flags default value, prefixing ImGui constants with 'M.'."""
+    s = s.replace("+", "")
+    if s.startswith("Im"):
+        # Split by | and handle each part for flags
+        parts = [part.strip() for part in s.split("|")]
+        lua_parts = []
+        for part in parts:
+            if part.startswith("Im"):
+                lua_parts.append("M." + part)
+            else:
+                lua_parts.append(part)
+        s = " | ".join(lua_parts)
+    if s.startswith("sizeof"):
+        s = "ffi.sizeof('" + stripSizeOf(s) + "')"
+    return s
+
+
+def luaifyFloatValue(s):
+    """Converts a float/double default value."""
+    if "FLT_MAX" in s:
+        return "math.huge"
+    if "FLT_MIN" in s:
+        return "-FLT_MIN"
+    return s.replace("+", "").replace("f", "")
+
+
+def luaifyRecordValue(s):
+    """Converts a struct/reference default value, e.g. a C++ constructor call like ImVec2(0,0)."""
+    if s.startswith("ImVec2"):
+        params = s[s.find("(") + 1 : s.find(")")]
+        params = params.replace("f", "")
+        return f'ffi.new("ImVec2_C", {params})'
+    if s.startswith("ImVec4"):
+        params = s[s.find("(") + 1 : s.find(")")]
+        params = params.replace("f", "")
+        return f'ffi.new("ImVec4_C", {params})'
+    return "M." + s
+
+
+def luaifyPointerValue(s):
+    """Converts a pointer default value: null pointers become nil, string literals stay as they are."""
+    if s == "nullptr" or s == "NULL":
         return "nil"
-    elif k == TyK.POINTER and s.startswith('"'):
+    if s.startswith('"'):
         return s
-    elif k == TyK.LVALUEREFERENCE or k == TyK.RECORD or k == TyK.POINTER:
-        # Handle C++ constructor calls like ImVec2(0,0)
-        if s.startswith("ImVec2"):
-            params = s[s.find("(") + 1 : s.find(")")]
-            params = params.replace("f", "")
-            return f'ffi.new("ImVec2_C", {params})'
-        if s.startswith("ImVec4"):
-            params = s[s.find("(") + 1 : s.find(")")]
-            params = params.replace("f", "")
-            return f'ffi.new("ImVec4_C", {params})'
-        return "M." + s
-    else:
-        print(f"unknown value type:  {k} {s}  ### parent =  {p.type.spelling}  {p.spelling}")
-    return s
+    return luaifyRecordValue(s)
+
+
+# Default value converters by the canonical type kind of the parameter.
+luaify_handlers = {
+    TyK.BOOL: lambda s: s,
+    TyK.INT: luaifyIntValue,
+    TyK.UINT: luaifyIntValue,
+    TyK.ENUM: luaifyIntValue,
+    TyK.LONGLONG: luaifyIntValue,
+    TyK.ULONGLONG: luaifyIntValue,
+    TyK.FLOAT: luaifyFloatValue,
+    TyK.DOUBLE: luaifyFloatValue,
+    TyK.POINTER: luaifyPointerValue,
+    TyK.LVALUEREFERENCE: luaifyRecordValue,
+    TyK.RECORD: luaifyRecordValue,
+}
 
 
 def luaifyValue(cParent, s):
@@ -356,55 +629,62 @@ def getLuaFunctionOptionalParams(c):
     Parses a function's tokens to extract default parameter values.
     
     Args:
-        c: The clang cursor for the function.
+        c: The AstNode of the function.
         
     Returns:
         A dictionary mapping sanitized parameter names to their Lua-ified default values,
         or None if there are no optional parameters.
     """
     parameter_opt = None
-    token = list(c.get_tokens())
-    for p in c.get_arguments():
-        for i in range(0, len(token)):
-            if (token[i].kind == TK.IDENTIFIER and token[i].spelling == p.spelling and
-                    i < len(token) - 2):
+    token = c.param_tokens
+    if not token:
+        return None
+    tokenCount = len(token)
+    # index of the first occurrence of each identifier, that is where a parameter is declared
+    identifierPos = {}
+    for i, (kind, spelling) in enumerate(token):
+        if kind == TK.IDENTIFIER and not spelling in identifierPos:
+            identifierPos[spelling] = i
+    for p in c.arguments():
+        i = identifierPos.get(p.spelling)
+        # need at least the '=' and one token of the value after the name
+        if i is None or i >= tokenCount - 2:
+            continue
+        i += 1
+        if token[i][0] == TK.PUNCTUATION and token[i][1] == "=":
+            i += 1
+            braceStack = 0
+            start_token_index = i
+            # Walk tokens to find the full default argument expression
+            while i < tokenCount:
+                kind, spelling = token[i]
+                if kind == TK.PUNCTUATION:
+                    if spelling in ("(", "{", "["):
+                        braceStack += 1
+                    elif spelling in (")", "}", "]"):
+                        if braceStack > 0:
+                            braceStack -= 1
+                        else:  # End of argument
+                            break
+                    elif spelling == "," and braceStack == 0:
+                        break  # End of argument
                 i += 1
-                if (token[i].kind == TK.PUNCTUATION and token[i].spelling == "=" and
-                        i < len(token) - 2):
-                    i += 1
-                    braceStack = 0
-                    start_token_index = i
-                    # Walk tokens to find the full default argument expression
-                    while i < len(token):
-                        current_token = token[i]
-                        if current_token.kind == TK.PUNCTUATION:
-                            if current_token.spelling in ("(", "{", "["):
-                                braceStack += 1
-                            elif current_token.spelling in (")", "}", "]"):
-                                if braceStack > 0:
-                                    braceStack -= 1
-                                else:  # End of argument
-                                    break
-                            elif current_token.spelling == "," and braceStack == 0:
-                                break  # End of argument
-                        i += 1
-
-                    # Reconstruct the default argument string from tokens
-                    optArg = " ".join(t.spelling for t in token[start_token_index:i])
-                    
-                    # Post-process to fix spacing issues
-                    optArg = (
-                        optArg.replace(" (", "(")
-                        .replace(" )", ")")
-                        .replace(" ,", ",")
-                        .replace(" | ", "|")
-                    )
-
-                    if parameter_opt is None:
-                        parameter_opt = {}
-                    param_name_lua = luaParameterSpelling(p, True)
-                    parameter_opt[param_name_lua] = luaifyValue(p, optArg.strip())
-                break
+
+            # Reconstruct the default argument string from tokens
+            optArg = " ".join(t[1] for t in token[start_token_index:i])
+            
+            # Post-process to fix spacing issues
+            optArg = (
+                optArg.replace(" (", "(")
+                .replace(" )", ")")
+                .replace(" ,", ",")
+                .replace(" | ", "|")
+            )
+
+            if parameter_opt is None:
+                parameter_opt = {}
+            param_name_lua = luaParameterSpelling(p, True)
+            parameter_opt[param_name_lua] = luaifyValue(p, optArg.strip())
     return parameter_opt
 
 
@@ -416,330 +696,8 @@ def getLuaFunctionOptionalParams(c):
 #  *Lua VM* = Lua code for inside the VM that does helper things like optional args
 
 
-class BindingGenerator:
-    """
-    Main class that traverses the Clang AST and generates bindings.
-    It produces three files:
-    1. C Header (imgui_gen.h): For LuaJIT FFI to define C types.
-    2. C++ Host (imguiApiHostGenerated.cpp): The C++ implementation of wrapped functions.
-    3. Lua Module (imgui_gen.lua): The Lua wrapper with helpers for optional arguments.
-    """
-    def __init__(self, debug):
-        self.functionRenames = {}
-        self.debug = debug
-
-    def _generateCVMStruct(self, c, level):
-        """Generates the C struct/union definition for the FFI header file."""
-        functionCache = ""
-        res = ""
-        if c.kind == CK.STRUCT_DECL:
-            if level == 0:
-                res += "  " * (level - 1) + "typedef struct " + c.spelling + " {\n"
-            else:
-                res += "  " * (level - 1) + "struct " + c.spelling + " {\n"
-        elif c.kind == CK.UNION_DECL:
-            res += "\n" + "  " * (level - 1) + "union {\n"
-
-        for ch in c.get_children():
-            if ch.kind == CK.FIELD_DECL:
-                if ch.type.spelling.find("(") >= 0:
-                    res += "  " * (level + 1) + "void* " + ch.spelling + "; // complex callback: " + ch.type.spelling + " - " + self.getCursorDebug(ch, "") + "\n"
-                else:
-                    res += "  " * (level + 1) + getCVarStr(ch, False, is_ffi_header=True) + ";" + self.getCursorDebug(ch, "   // ") + "\n"
-            elif ch.kind == CK.CONSTRUCTOR and level == 0:
-                functionCache += "// " + self._generateCVMFunction(ch, "imgui_", None)
-            elif ch.kind == CK.STRUCT_DECL or ch.kind == CK.UNION_DECL:
-                res += "  " * (level + 1) + self.getCursorDebug(ch, " // ") + "\n"
-                res += self._generateCVMStruct(ch, level + 1)
-            elif (ch.kind == CK.FUNCTION_DECL or ch.kind == CK.CXX_METHOD) and ch.spelling.find("operator") == -1 and level == 0:
-                if ch.get_usr() in skip_usrs or ch.spelling in skip_names:
-                    pass
-                else:
-                    functionCache += self._generateCVMFunction(ch, "imgui_" + c.spelling + "_", c.spelling + "* " + c.spelling + "_ctx")
-
-        if c.kind == CK.STRUCT_DECL:
-            if level == 0:
-                res += "  " * level + "} " + c.spelling + ";\n"
-            else:
-                res += "  " * level + "};\n"
-        elif c.kind == CK.UNION_DECL:
-            res += "  " * level + "};\n"
-        res += functionCache
-        return res
-
-    def _generateLVMStruct(self, c):
-        """Generates Lua wrapper functions for a struct's methods."""
-        if debug:
-            res = "--=== struct " + c.spelling + " === " + c.get_usr() + "\n"
-        else:
-            res = "--=== struct " + c.spelling + " ===\n"
-        for ch in c.get_children():
-            if ch.get_usr() in skip_usrs or ch.spelling in skip_names or ch.kind == CK.CLASS_TEMPLATE or ch.kind == CK.FUNCTION_TEMPLATE:
-                continue
-            if (ch.kind == CK.FUNCTION_DECL or ch.kind == CK.CXX_METHOD) and ch.spelling.find("operator") == -1:
-                res += self._generateLuaVMFunction(ch, c.spelling + "_", "imgui_" + c.spelling + "_", c.spelling + "_ctx")
-            elif ch.kind == CK.CONSTRUCTOR:
-                if ch.spelling in skip_constructors:
-                    continue
-                else:
-                    res += self._generateLuaConstructor(ch)
-        res += "--===\n"
-        return res
-
-    def _generateCHostStruct(self, c):
-        """Generates the C++ host implementation for a struct's methods."""
-        res = ""
-        for ch in c.get_children():
-            if ch.get_usr() in skip_usrs or ch.spelling in skip_names or ch.kind == CK.CLASS_TEMPLATE or ch.kind == CK.FUNCTION_TEMPLATE:
-                continue
-            if (ch.kind == CK.FUNCTION_DECL or ch.kind == CK.CXX_METHOD) and ch.spelling.find("operator") == -1:
-                res += self._generateCHostFunction(ch, "imgui_" + c.spelling + "_", c.spelling + "_ctx->", c.spelling + "_ctx", c.type.spelling)
-        return res
-
-    def _generateLuaConstructor(self, c):
-        """Generates a Lua helper function to construct a C struct via ffi.new."""
-        signature, resStr, parameter_names, isVariadic, parameter_deref, parameter_wrappers = self.getCFunctionSignature(c, "", None, False)
-        i = 0
-        for param in parameter_names:
-            if param and param[0] == "_":
-                parameter_names[i] = param[1:]
-                i += 1
-        func = "function M." + c.spelling + "(" + ", ".join(parameter_names) + ")"
-        funcPtr = "function M." + c.spelling + "Ptr(" + ", ".join(parameter_names) + ")"
-        if len(parameter_names) > 0:
-            func += '\n  local res = ffi.new("' + c.spelling + '")\n'
-            for param in parameter_names:
-                func += "  res." + param + " = " + param + "\n"
-            func += "  return res\n"
-        else:
-            func += ' return ffi.new("' + c.spelling + '") '
-            funcPtr += ' return ffi.new("' + c.spelling + '[1]") '
-        func += "end\n"
-        funcPtr += "end\n"
-        return func + funcPtr
-
-    def _generateCVMFunction(self, c, prefix, firstArg):
-        """Generates the C function declaration for the FFI header."""
-        signature, _, _, _, _, _ = self.getCFunctionSignature(c, prefix, firstArg, False, is_ffi_header=True)
-        return signature + ";" + self.getCursorDebug(c, "   // ") + "\n"
-
-    def _generateCHostFunction(self, c, prefix, cNamespace, firstArgName, firstArgType):
-        """Generates the C++ host implementation of a wrapped function."""
-        firstArg = None
-        functionAppendix = ""
-        if firstArgName and firstArgType:
-            firstArg = firstArgType + "* " + firstArgName
-        signature, resStr, parameter_names, isVariadic, parameter_deref, parameter_wrappers = self.getCFunctionSignature(c, prefix, firstArg, True)
-        res = ""
-        if self.debug:
-            res += "\n" + self.getCursorDebug(c, "// ") + "\n"
-        res += "FFI_EXPORT " + signature + " {\n"
-        if isVariadic:
-            functionAppendix = "V"
-            if "fmt" in parameter_names:
-                last_param_name = "fmt"
-            else:
-                last_param_name = parameter_names[-1] if parameter_names else ""
-            parameter_names.append("args")
-            parameter_deref.append(False)
-            parameter_wrappers.append(("", ""))
-            res += "  va_list args;\n"
-            res += f"  va_start(args, {last_param_name});\n"
-
-        paramArr = []
-        for i in range(0, len(parameter_names)):
-            p_name = parameter_names[i]
-            if parameter_deref[i]:
-                p_name = "*" + p_name
-
-            # Apply wrapper (e.g., for ImTextureRef)
-            wrapper = parameter_wrappers[i]
-            p_name = wrapper[0] + p_name + wrapper[1]
-
-            paramArr.append(p_name)
-        paramStr = ", ".join(paramArr)
-
-        rt = c.result_type
-        if c.result_type.kind == TyK.TYPEDEF:
-            rt = c.result_type.get_canonical()
-        
-        call_str = cNamespace + c.spelling + functionAppendix + "(" + paramStr + ")"
-        
-        if rt.spelling == "ImVec2":
-            res += f"  const ImVec2& res_cxx = {call_str};\n"
-            res += "  ImVec2_C res_c = {res_cxx.x, res_cxx.y};\n"
-            res += "  return res_c;\n"
-        elif rt.spelling == "ImVec4" or rt.spelling == "ImColor":
-            res += f"  const ImVec4& res_cxx = {call_str};\n"
-            res += "  ImVec4_C res_c = {res_cxx.x, res_cxx.y, res_cxx.z, res_cxx.w};\n"
-            res += "  return res_c;\n"
-        else:
-            res += "  " + resStr + call_str + ";\n"
-        if isVariadic:
-            res += "  va_end(args);\n"
-        res += "}\n\n"
-        return res
-
-    def _generateLuaVMFunction(self, c, prefixLua, prefixC, firstArg):
-        """Generates the Lua wrapper function, handling default arguments."""
-        signature, resStr, parameter_names, isVariadic, parameter_deref, _ = self.getCFunctionSignature(c, "imgui_", None, False)
-        parameters = []
-        parameter_opt = getLuaFunctionOptionalParams(c)
-        parameter_PtrChecks = {}
-        for p in c.get_arguments():
-            if p.spelling != "ctx":
-                param_lua_name = luaParameterSpelling(p, True)
-                parameters.append(param_lua_name)
-                if p.type.spelling.find("*") != -1:
-                    parameter_PtrChecks[param_lua_name] = p.type.spelling
-
-        multiLineFunction = False
-        if firstArg:
-            parameters.insert(0, firstArg)
-
-        lua_call_params = list(parameters)
-        if isVariadic:
-            parameters.append("...")
-            lua_call_params.append("...")
-
-        res = ""
-        if self.debug:
-            res += "\n" + self.getCursorDebug(c, "-- ") + "\n"
-            multiLineFunction = True
-        res += "function M." + prefixLua + self.getFunctionName(c) + "(" + ", ".join(parameters) + ") "
-        if parameter_opt:
-            multiLineFunction = True
-            res += "\n"
-            for k, v in parameter_opt.items():
-                if v == "nil":
-                    res += "  -- " + k + " is optional and can be nil\n"
-                else:
-                    if v == "-FLT_MIN":
-                        v = "M.ImVec2( -FLT_MIN, 0)"
-                    res += "  if " + k + " == nil then " + k + " = " + v + " end\n"
-
-        if len(parameter_PtrChecks) > 0:
-            if not multiLineFunction:
-                res += "\n"
-            multiLineFunction = True
-            for k, v in parameter_PtrChecks.items():
-                if parameter_opt and k in parameter_opt and parameter_opt[k] == "nil":
-                    continue
-                res += "  if " + k + ' == nil then log("E", "", "Parameter \'' + k + "' of function '" + self.getFunctionName(c) + "' cannot be nil, as the c type is '" + v + "'\") ; return end\n"
-
-        if debug:
-            res += "\n"
-            parameters2 = []
-            for p in parameters:
-                if p == "...":
-                    p = "{...}"
-                parameters2.append('" .. dumps(' + p + ') .. "')
-            res += '  print("*** calling FFI: ' + prefixC + self.getFunctionName(c) + "(" + (", ".join(parameters2)) + ')")\n'
-
-        if multiLineFunction:
-            res += "  "
-
-        if c.result_type.spelling != "void":
-            res += "return "
-        res += "C." + prefixC + self.getFunctionName(c) + "(" + ", ".join(lua_call_params) + ")"
-        if multiLineFunction:
-            res += "\nend\n"
-        else:
-            res += " end\n"
-        return res
-
-    def _generateCVMEnum(self, c):
-        """Generates a C enum or typedef for the FFI header."""
-        name = c.spelling
-        constants = []
-        for ch in c.get_children():
-            if ch.kind == CK.ENUM_CONSTANT_DECL:
-                value = ""
-                for ca in ch.get_children():
-                    if ca.kind == CK.UNEXPOSED_EXPR or ca.kind == CK.BINARY_OPERATOR:
-                        value = " = " + getContent(ca, False)
-                        break
-                constants.append("  " + ch.spelling + value)
-        if len(constants) == 0:
-            res = "typedef " + c.enum_type.get_canonical().spelling + " " + name + ";\n"
-            return res
-        res = self.getCursorDebug(c, "// ") + "\n"
-        res = res + "typedef enum {\n" + ",\n".join(constants) + "\n} " + name + ";\n"
-        return res
-
-    def _generateLVMEnum(self, c):
-        """Generates Lua variables for each enum constant."""
-        res = "--=== enum " + c.spelling + " ===\n"
-        for ch in c.get_children():
-            if ch.kind == CK.ENUM_CONSTANT_DECL:
-                lname = ch.spelling
-                if lname.startswith("ImGui"):
-                    lname = lname[5:]
-                res += "M." + lname + " = C." + ch.spelling + "\n"
-        res += "--===\n"
-        return res
-
-    def _traverse(self, c, level):
-        """
-        Recursively traverses the AST, calling the appropriate generator for each node.
-        
-        Args:
-            c: The current clang cursor.
-            level (int): The current depth in the AST.
-        """
-        if c.location.file and not c.location.file.name.endswith(self.sFilename):
-            return
-
-        if c.get_usr() in skip_usrs or c.spelling in skip_names or c.kind == CK.CLASS_TEMPLATE or c.kind == CK.FUNCTION_TEMPLATE:
-            return
-
-        if c.kind == CK.FUNCTION_DECL or c.kind == CK.CXX_METHOD:
-            if c.spelling.find("operator") == 0:
-                return
-            self.tVMFile.write(self._generateCVMFunction(c, "imgui_", None))
-            self.tHostFile.write(self._generateCHostFunction(c, "imgui_", "ImGui::", None, None))
-            self.tLuaFile.write(self._generateLuaVMFunction(c, "", "imgui_", None))
-            return
-        elif c.kind == CK.TYPEDEF_DECL:
-            txt = getContent(c, False)
-            self.tVMFile.write(txt + ";\n")
-            return
-        elif c.kind == CK.STRUCT_DECL or c.kind == CK.UNION_DECL:
-            if c.is_definition():
-                self.tVMFile.write(self._generateCVMStruct(c, 0))
-                self.tHostFile.write(self._generateCHostStruct(c))
-                self.tLuaFile.write(self._generateLVMStruct(c))
-            else:
-                self.tVMFile.write("typedef struct " + c.spelling + " " + c.spelling + ";\n")
-            return
-        elif c.kind == CK.ENUM_DECL:
-            self.tVMFile.write(self._generateCVMEnum(c))
-            self.tLuaFile.write(self._generateLVMEnum(c))
-            return
-        elif c.kind == CK.TRANSLATION_UNIT or c.kind == CK.NAMESPACE:
-            pass
-        else:
-            print("* unhandled item: " + " " * level, str(c.kind)[str(c.kind).index(".") + 1 :], c.type.spelling, c.spelling)
-            print(" " * level, "  ", getContent(c, True))
-
-        for cn in c.get_children():
-            self._traverse(cn, level + 1)
-
-    def generate(self, c, sFilename):
-        """
-        Main generation method. Sets up output files and starts the AST traversal.
-        
-        Args:
-            c: The root cursor of the translation unit.
-            sFilename (str): The name of the input header file.
-        """
-        self.sFilename = sFilename
-        outDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "generated")
-        if not os.path.exists(outDir):
-            os.mkdir(outDir)
-
-        with open(os.path.join(outDir, "imgui_gen.lua"), "w", encoding='utf-8') as self.tLuaFile:
-            self.tLuaFile.write("""
+# Start of the Lua module (imgui_gen.lua), the wrappers are generated into M.init().
+lua_preamble = """
 
 local ffi = require('ffi')
 
@@ -1000,9 +958,11 @@ local FLT_MIN = -3.402823466e+38
 function M.init(lib)
     C = lib
 
-""")
-            with open(os.path.join(outDir, "imgui_gen.h"), "w", encoding='utf-8') as self.tVMFile:
-                self.tVMFile.write("""
+"""
+
+
+# Start of the FFI header (imgui_gen.h) with the types the generated declarations rely on.
+ffi_header_preamble = """
 ///////////////////////////////////////////////////////////////////////////////
 // this file is used for declaring C types for LuaJIT's FFI. Do not use it in C
 ///////////////////////////////////////////////////////////////////////////////
@@ -1021,9 +981,11 @@ typedef struct { float x, y, z, w; } ImVec4_C;
 // Typedef for ImTextureID for FFI, as ImGui uses ImU64
 typedef unsigned long long ImTextureID;
 
-""")
-                with open(os.path.join(outDir, "imguiApiHostGenerated.cpp"), "w", encoding='utf-8') as self.tHostFile:
-                    self.tHostFile.write("""// !!!! DO NOT EDIT THIS FILE -- It was automatically generated by gen.py -- DO NOT EDIT THIS FILE !!!!
+"""
+
+
+# Start of the C++ host (imguiApiHostGenerated.cpp) opening the extern "C" block of the wrappers.
+host_preamble = """// !!!! DO NOT EDIT THIS FILE -- It was automatically generated by gen.py -- DO NOT EDIT THIS FILE !!!!
 
 #if defined(BNG_VERSION)
   #include "imguiApiHost.h"
@@ -1052,75 +1014,404 @@ extern "C" {
   typedef ImU64 ImTextureID;
 #endif // STANDALONE
 
-""")
-                    self.detectOverloads(c)
-                    self._traverse(c, 0)
-                    self.tHostFile.write("""
+"""
+
+
+# End of the C++ host closing the extern "C" block.
+host_trailer = """
 
 #undef FFI_EXPORT
 } // extern C
-""")
-            self.tLuaFile.write("""
+"""
+
+
+# End of the Lua module.
+lua_trailer = """
 end
 return M
-""")
+"""
 
-    def getCursorDebug(self, c, prefix):
-        """Returns the cursor's USR for debugging purposes if debug mode is enabled."""
-        if not self.debug:
-            return ""
+
+class BindingGenerator:
+    """
+    Main class that traverses the Clang AST and generates bindings.
+    It produces three files:
+    1. C Header (imgui_gen.h): For LuaJIT FFI to define C types.
+    2. C++ Host (imguiApiHostGenerated.cpp): The C++ implementation of wrapped functions.
+    3. Lua Module (imgui_gen.lua): The Lua wrapper with helpers for optional arguments.
+    """
+    def __init__(self, debug):
+        self.functionRenames = {}
+        self.debug = debug
+        if not debug:
+            # release builds never carry debug comments, don't pay for the USR lookups
+            self.getCursorDebug = lambda c, prefix: ""
+
+    def _generateCVMField(self, c, level):
+        """Generates a struct field declaration for the FFI header file."""
+        if c.type_spelling.find("(") >= 0:
+            return "  " * (level + 1) + "void* " + c.spelling + "; // complex callback: " + c.type_spelling + " - " + self.getCursorDebug(c, "") + "\n"
+        return "  " * (level + 1) + getCVarStr(c, False, is_ffi_header=True) + ";" + self.getCursorDebug(c, "   // ") + "\n"
+
+    def _generateCVMStruct(self, c, level):
+        """Generates the C definition of a nested struct/union for the FFI header file."""
+        res = []
+        if c.kind == CK.STRUCT_DECL:
+            res.append("  " * (level - 1) + "struct " + c.spelling + " {\n")
+        elif c.kind == CK.UNION_DECL:
+            res.append("\n" + "  " * (level - 1) + "union {\n")
+
+        for ch in c.children:
+            if ch.kind == CK.FIELD_DECL:
+                res.append(self._generateCVMField(ch, level))
+            elif ch.kind in record_kinds:
+                res.append("  " * (level + 1) + self.getCursorDebug(ch, " // ") + "\n")
+                res.append(self._generateCVMStruct(ch, level + 1))
+
+        res.append("  " * level + "};\n")
+        return "".join(res)
+
+    def _emitStruct(self, c, vmOut, hostOut, luaOut):
+        """
+        Generates everything for a top level struct/union in a single pass over its children:
+        the C definition and method declarations for the FFI header, the C++ host wrappers
+        and the Lua wrappers/constructors.
+        """
+        if c.kind == CK.STRUCT_DECL:
+            vmOut.write("typedef struct " + c.spelling + " {\n")
+        else:
+            vmOut.write("\nunion {\n")
+        if debug:
+            luaOut.write("--=== struct " + c.spelling + " === " + c.usr + "\n")
+        else:
+            luaOut.write("--=== struct " + c.spelling + " ===\n")
+
+        # method declarations go below the struct definition in the FFI header
+        vmFunctions = io.StringIO()
+        for ch in c.children:
+            if ch.kind == CK.FIELD_DECL:
+                vmOut.write(self._generateCVMField(ch, 0))
+            elif ch.kind in record_kinds:
+                vmOut.write("  " + self.getCursorDebug(ch, " // ") + "\n")
+                vmOut.write(self._generateCVMStruct(ch, 1))
+            elif ch.kind == CK.CONSTRUCTOR:
+                vmFunctions.write("// " + self._generateCVMFunction(ch, "imgui_", None))
+                if not isSkipped(ch) and not ch.spelling in skip_constructors:
+                    luaOut.write(self._generateLuaConstructor(ch))
+            elif isGeneratableFunction(ch):
+                vmFunctions.write(self._generateCVMFunction(ch, "imgui_" + c.spelling + "_", c.spelling + "* " + c.spelling + "_ctx"))
+                hostOut.write(self._generateCHostFunction(ch, "imgui_" + c.spelling + "_", c.spelling + "_ctx->", c.spelling + "_ctx", c.type_spelling))
+                luaOut.write(self._generateLuaVMFunction(ch, c.spelling + "_", "imgui_" + c.spelling + "_", c.spelling + "_ctx"))
+
+        if c.kind == CK.STRUCT_DECL:
+            vmOut.write("} " + c.spelling + ";\n")
+        else:
+            vmOut.write("};\n")
+        vmOut.write(vmFunctions.getvalue())
+        luaOut.write("--===\n")
+
+    def _generateLuaConstructor(self, c):
+        """Generates a Lua helper function to construct a C struct via ffi.new."""
+        signature, resStr, parameter_names, isVariadic, parameter_deref, parameter_wrappers = self.getCFunctionSignature(c, "", None, False)
+        i = 0
+        for param in parameter_names:
+            if param and param[0] == "_":
+                parameter_names[i] = param[1:]
+                i += 1
+        func = ["function M." + c.spelling + "(" + ", ".join(parameter_names) + ")"]
+        funcPtr = "function M." + c.spelling + "Ptr(" + ", ".join(parameter_names) + ")"
+        if len(parameter_names) > 0:
+            func.append('\n  local res = ffi.new("' + c.spelling + '")\n')
+            func.extend("  res." + param + " = " + param + "\n" for param in parameter_names)
+            func.append("  return res\n")
+        else:
+            func.append(' return ffi.new("' + c.spelling + '") ')
+            funcPtr += ' return ffi.new("' + c.spelling + '[1]") '
+        func.append("end\n")
+        funcPtr += "end\n"
+        return "".join(func) + funcPtr
+
+    def _generateCVMFunction(self, c, prefix, firstArg):
+        """Generates the C function declaration for the FFI header."""
+        signature, _, _, _, _, _ = self.getCFunctionSignature(c, prefix, firstArg, False, is_ffi_header=True)
+        return signature + ";" + self.getCursorDebug(c, "   // ") + "\n"
+
+    def _generateCHostFunction(self, c, prefix, cNamespace, firstArgName, firstArgType):
+        """Generates the C++ host implementation of a wrapped function."""
+        firstArg = None
+        functionAppendix = ""
+        if firstArgName and firstArgType:
+            firstArg = firstArgType + "* " + firstArgName
+        signature, resStr, parameter_names, isVariadic, parameter_deref, parameter_wrappers = self.getCFunctionSignature(c, prefix, firstArg, True)
+        res = []
+        if self.debug:
+            res.append("\n" + self.getCursorDebug(c, "// ") + "\n")
+        res.append("FFI_EXPORT " + signature + " {\n")
+        if isVariadic:
+            functionAppendix = "V"
+            if "fmt" in parameter_names:
+                last_param_name = "fmt"
+            else:
+                last_param_name = parameter_names[-1] if parameter_names else ""
+            parameter_names.append("args")
+            parameter_deref.append(False)
+            parameter_wrappers.append(("", ""))
+            res.append("  va_list args;\n")
+            res.append(f"  va_start(args, {last_param_name});\n")
+
+        # dereference where needed and apply the wrapper (e.g., for ImTextureRef)
+        paramStr = ", ".join(w0 + ("*" if deref else "") + name + w1 for name, deref, (w0, w1) in zip(parameter_names, parameter_deref, parameter_wrappers))
+
+        call_str = cNamespace + c.spelling + functionAppendix + "(" + paramStr + ")"
+        
+        rt = c.result_type_resolved_spelling
+        if rt == "ImVec2":
+            res.append(f"  const ImVec2& res_cxx = {call_str};\n")
+            res.append("  ImVec2_C res_c = {res_cxx.x, res_cxx.y};\n")
+            res.append("  return res_c;\n")
+        elif rt == "ImVec4" or rt == "ImColor":
+            res.append(f"  const ImVec4& res_cxx = {call_str};\n")
+            res.append("  ImVec4_C res_c = {res_cxx.x, res_cxx.y, res_cxx.z, res_cxx.w};\n")
+            res.append("  return res_c;\n")
+        else:
+            res.append("  " + resStr + call_str + ";\n")
+        if isVariadic:
+            res.append("  va_end(args);\n")
+        res.append("}\n\n")
+        return "".join(res)
+
+    def _generateLuaVMFunction(self, c, prefixLua, prefixC, firstArg):
+        """Generates the Lua wrapper function, handling default arguments."""
+        signature, resStr, parameter_names, isVariadic, parameter_deref, _ = self.getCFunctionSignature(c, "imgui_", None, False)
+        parameters = []
+        parameter_opt = getLuaFunctionOptionalParams(c)
+        parameter_PtrChecks = {}
+        for p in c.arguments():
+            if p.spelling != "ctx":
+                param_lua_name = luaParameterSpelling(p, True)
+                parameters.append(param_lua_name)
+                if p.type_spelling.find("*") != -1:
+                    parameter_PtrChecks[param_lua_name] = p.type_spelling
+
+        multiLineFunction = False
+        if firstArg:
+            parameters.insert(0, firstArg)
+
+        lua_call_params = list(parameters)
+        if isVariadic:
+            parameters.append("...")
+            lua_call_params.append("...")
+
+        res = []
+        if self.debug:
+            res.append("\n" + self.getCursorDebug(c, "-- ") + "\n")
+            multiLineFunction = True
+        res.append("function M." + prefixLua + self.getFunctionName(c) + "(" + ", ".join(parameters) + ") ")
+        if parameter_opt:
+            multiLineFunction = True
+            res.append("\n")
+            for k, v in parameter_opt.items():
+                if v == "nil":
+                    res.append("  -- " + k + " is optional and can be nil\n")
+                else:
+                    if v == "-FLT_MIN":
+                        v = "M.ImVec2( -FLT_MIN, 0)"
+                    res.append("  if " + k + " == nil then " + k + " = " + v + " end\n")
+
+        if len(parameter_PtrChecks) > 0:
+            if not multiLineFunction:
+                res.append("\n")
+            multiLineFunction = True
+            for k, v in parameter_PtrChecks.items():
+                if parameter_opt and k in parameter_opt and parameter_opt[k] == "nil":
+                    continue
+                res.append("  if " + k + ' == nil then log("E", "", "Parameter \'' + k + "' of function '" + self.getFunctionName(c) + "' cannot be nil, as the c type is '" + v + "'\") ; return end\n")
+
+        if debug:
+            res.append("\n")
+            parameters2 = []
+            for p in parameters:
+                if p == "...":
+                    p = "{...}"
+                parameters2.append('" .. dumps(' + p + ') .. "')
+            res.append('  print("*** calling FFI: ' + prefixC + self.getFunctionName(c) + "(" + (", ".join(parameters2)) + ')")\n')
+
+        if multiLineFunction:
+            res.append("  ")
+
+        if c.result_type_spelling != "void":
+            res.append("return ")
+        res.append("C." + prefixC + self.getFunctionName(c) + "(" + ", ".join(lua_call_params) + ")")
+        if multiLineFunction:
+            res.append("\nend\n")
         else:
-            return prefix + c.get_usr()
+            res.append(" end\n")
+        return "".join(res)
+
+    def _generateCVMEnum(self, c):
+        """Generates a C enum or typedef for the FFI header."""
+        name = c.spelling
+        constants = []
+        for ch in c.children:
+            if ch.kind == CK.ENUM_CONSTANT_DECL:
+                value = ""
+                # a child is the initializer expression, take its text from the 'NAME = VALUE' source
+                if ch.children:
+                    decl = getContent(ch, False)
+                    eq = decl.find("=")
+                    if eq >= 0:
+                        value = " = " + decl[eq + 1 :].strip()
+                constants.append("  " + ch.spelling + value)
+        if len(constants) == 0:
+            res = "typedef " + c.enum_type_spelling + " " + name + ";\n"
+            return res
+        res = self.getCursorDebug(c, "// ") + "\n"
+        res = res + "typedef enum {\n" + ",\n".join(constants) + "\n} " + name + ";\n"
+        return res
+
+    def _generateLVMEnum(self, c):
+        """Generates Lua variables for each enum constant."""
+        res = ["--=== enum " + c.spelling + " ===\n"]
+        for ch in c.children:
+            if ch.kind == CK.ENUM_CONSTANT_DECL:
+                lname = ch.spelling
+                if lname.startswith("ImGui"):
+                    lname = lname[5:]
+                res.append("M." + lname + " = C." + ch.spelling + "\n")
+        res.append("--===\n")
+        return "".join(res)
+
+    def _traverse(self, c, level, decls):
+        """
+        Recursively traverses the AST and collects the declarations to generate bindings for.
+        
+        Args:
+            c: The current AstNode.
+            level (int): The current depth in the AST.
+            decls (list): Receives the function, typedef, struct/union and enum nodes in source order.
+        """
+        if c.filename and not c.filename.endswith(self.sFilename):
+            return
+
+        if isSkipped(c):
+            return
+
+        if c.kind in named_function_kinds:
+            if c.spelling.startswith("operator"):
+                return
+            decls.append(c)
+            return
+        elif c.kind in type_decl_kinds:
+            decls.append(c)
+            return
+        elif c.kind in container_kinds:
+            pass
+        else:
+            print("* unhandled item: " + " " * level, str(c.kind)[str(c.kind).index(".") + 1 :], c.type_spelling, c.spelling)
+            print(" " * level, "  ", getContent(c, True))
+
+        for cn in c.children:
+            self._traverse(cn, level + 1, decls)
+
+    def _generateDecls(self, decls):
+        """Calls the appropriate generators for each declaration collected by _traverse."""
+        for c in decls:
+            if c.kind in named_function_kinds:
+                self.tVMFile.write(self._generateCVMFunction(c, "imgui_", None))
+                self.tHostFile.write(self._generateCHostFunction(c, "imgui_", "ImGui::", None, None))
+                self.tLuaFile.write(self._generateLuaVMFunction(c, "", "imgui_", None))
+            elif c.kind == CK.TYPEDEF_DECL:
+                txt = getContent(c, False)
+                self.tVMFile.write(txt + ";\n")
+            elif c.kind in record_kinds:
+                if c.is_definition:
+                    self._emitStruct(c, self.tVMFile, self.tHostFile, self.tLuaFile)
+                else:
+                    self.tVMFile.write("typedef struct " + c.spelling + " " + c.spelling + ";\n")
+            elif c.kind == CK.ENUM_DECL:
+                self.tVMFile.write(self._generateCVMEnum(c))
+                self.tLuaFile.write(self._generateLVMEnum(c))
+
+    def generate(self, c, sFilename):
+        """
+        Main generation method. Sets up output files and starts the AST traversal.
+        
+        Args:
+            c: The root AstNode of the translation unit.
+            sFilename (str): The name of the input header file.
+        """
+        self.sFilename = sFilename
+        outDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "generated")
+        if not os.path.exists(outDir):
+            os.mkdir(outDir)
+
+        # everything is generated into memory first and written out in one go at the end
+        self.tLuaFile = io.StringIO()
+        self.tVMFile = io.StringIO()
+        self.tHostFile = io.StringIO()
+
+        self.tLuaFile.write(lua_preamble)
+        self.tVMFile.write(ffi_header_preamble)
+        self.tHostFile.write(host_preamble)
+        self.detectOverloads(c)
+        decls = []
+        self._traverse(c, 0, decls)
+        self._generateDecls(decls)
+        self.tHostFile.write(host_trailer)
+        self.tLuaFile.write(lua_trailer)
+
+        for fileName, buf in (("imgui_gen.lua", self.tLuaFile), ("imgui_gen.h", self.tVMFile), ("imguiApiHostGenerated.cpp", self.tHostFile)):
+            writeFile(os.path.join(outDir, fileName), buf.getvalue())
+
+    def getCursorDebug(self, c, prefix):
+        """Returns the cursor's USR for debugging purposes. Replaced by a no-op in __init__ unless debug mode is enabled."""
+        return prefix + c.usr
 
     def getFunctionName(self, c):
         """Gets the function name, using a renamed version if it's an overload."""
-        u = c.get_usr()
-        if u in self.functionRenames:
-            return self.functionRenames[u]
-        else:
-            return c.spelling
+        return self.functionRenames.get(c.usr, c.spelling)
 
     def detectOverloads(self, c):
         """
         Top-level function to find and record overloaded functions.
         This populates self.functionRenames to give overloads unique names (e.g., myFunction1, myFunction2).
         """
-        fctCache = {}
-        self._rec_detectOverloads(fctCache, c, 0, "")
-        for k in list(fctCache.keys()):
-            if len(fctCache[k]) == 1:
-                del fctCache[k]
-        for k, v in fctCache.items():
-            for i in range(len(v)):
-                self.functionRenames[v[i].get_usr()] = v[i].spelling + str(i + 1)
-
-    def _rec_detectOverloads(self, fctCache, c, level, prefix):
-        """Recursively traverses the AST to find functions with the same name."""
-        if c.kind == CK.STRUCT_DECL or c.kind == CK.TRANSLATION_UNIT or c.kind == CK.NAMESPACE:
-            prefix += c.spelling + "_"
-        elif c.kind == CK.FUNCTION_DECL or c.kind == CK.CXX_METHOD:
-            if c.spelling.find("operator") == 0:
-                return
-            uName = prefix + c.spelling
-            if not uName in fctCache:
-                fctCache[uName] = []
-            usr = c.get_usr()
-            contained = False
-            for f in fctCache[uName]:
-                if f.get_usr() == usr:
-                    contained = True
-                    break
-            if not contained:
-                fctCache[uName].append(c)
-        for cn in c.get_children():
-            self._rec_detectOverloads(fctCache, cn, level, prefix)
+        for functions in self._collectFunctionsByName(c).values():
+            if len(functions) < 2:
+                continue
+            for i, f in enumerate(functions, 1):
+                self.functionRenames[f.usr] = f.spelling + str(i)
+
+    def _collectFunctionsByName(self, c):
+        """
+        Walks the AST in source order to find functions with the same name.
+        Returns a dict mapping each scope qualified name to its functions, redeclarations are skipped.
+        """
+        fctCache = collections.defaultdict(list)
+        fctUsrs = collections.defaultdict(set)
+        stack = collections.deque([(c, "")])
+        while stack:
+            c, prefix = stack.pop()
+            if c.kind in overload_scope_kinds:
+                prefix += c.spelling + "_"
+            elif c.kind in named_function_kinds:
+                if c.spelling.startswith("operator"):
+                    continue
+                uName = prefix + c.spelling
+                usrs = fctUsrs[uName]
+                if not c.usr in usrs:
+                    usrs.add(c.usr)
+                    fctCache[uName].append(c)
+            # reversed, so the children are popped in source order
+            stack.extend((cn, prefix) for cn in reversed(c.children))
+        return fctCache
 
     def getCFunctionSignature(self, c, prefix, firstArg, isHost, is_ffi_header=False):
         """
         Constructs the full C function signature and extracts parameter details.
         
         Args:
-            c: The function cursor.
+            c: The AstNode of the function.
             prefix (str): Prefix for the function name (e.g., "imgui_").
             firstArg (str): An optional first argument to prepend (for member functions).
             isHost (bool): True if generating for the C++ host, affects type conversions.
@@ -1134,16 +1425,16 @@ return M
         parameter_names = []
         parameter_deref = []
         parameter_wrappers = []  # For C++ host call, e.g. ImTextureRef( ... )
-        isVariadic = c.type.is_function_variadic()
+        isVariadic = c.is_variadic
 
-        for p in c.get_arguments():
+        for p in c.arguments():
             parameters.append(getCVarStr(p, False, is_ffi_header=is_ffi_header))
-            dereferenceRequired = p.type.kind == TyK.LVALUEREFERENCE or p.type.spelling.endswith(" &")
+            dereferenceRequired = p.type_kind == TyK.LVALUEREFERENCE or p.type_spelling.endswith(" &")
             parameter_names.append(luaParameterSpelling(p, False))
             parameter_deref.append(dereferenceRequired)
             
             # Special handling for ImTextureRef for the C++ host wrapper
-            if isHost and p.type.spelling == "ImTextureRef":
+            if isHost and p.type_spelling == "ImTextureRef":
                 parameter_wrappers.append(("ImTextureRef(", ")"))
             else:
                 parameter_wrappers.append(("", ""))
@@ -1154,24 +1445,49 @@ return M
             parameters.insert(0, firstArg)
 
         resStr = "return "
-        resType = c.result_type.spelling
-        effectiveReturnType = c.result_type
-        if c.result_type.kind == TyK.TYPEDEF:
-            effectiveReturnType = c.result_type.get_canonical()
+        resType = c.result_type_spelling
+        effectiveReturnType = c.result_type_resolved_spelling
 
         if isHost:
-            if effectiveReturnType.spelling == "ImVec2":
+            if effectiveReturnType == "ImVec2":
                 resType = "ImVec2_C"
-            elif effectiveReturnType.spelling == "ImVec4" or effectiveReturnType.spelling == "ImColor":
+            elif effectiveReturnType == "ImVec4" or effectiveReturnType == "ImColor":
                 resType = "ImVec4_C"
+        elif is_ffi_header:
+            resType = ffiTypeStr(resType)
 
         if resType == "void":
             resStr = ""
 
-        signature = resType + " " + prefix + self.getFunctionName(c) + "(" + ", ".join(parameters) + ")"
+        signature = f"{resType} {prefix}{self.getFunctionName(c)}({', '.join(parameters)})"
         return signature, resStr, parameter_names, isVariadic, parameter_deref, parameter_wrappers
 
 
+def findLibclang(candidates):
+    """
+    Returns the first of the candidate libclang paths that exists, or None.
+    The result is remembered in libclang_path_cache, later runs use it right away as long as
+    it still exists and is still a candidate.
+    """
+    try:
+        with open(libclang_path_cache, "r", encoding="utf-8") as f:
+            path = f.read().strip()
+        if path in candidates and os.path.exists(path):
+            return path
+    except OSError:
+        pass
+    for path in candidates:
+        if os.path.exists(path):
+            try:
+                os.makedirs(os.path.dirname(libclang_path_cache), exist_ok=True)
+                with open(libclang_path_cache, "w", encoding="utf-8") as f:
+                    f.write(path)
+            except OSError:
+                pass  # not being able to remember it is no reason to fail
+            return path
+    return None
+
+
 def main():
     """Main execution entry point."""
     if len(sys.argv) != 2:
@@ -1203,11 +1519,7 @@ def main():
                 "/usr/lib/llvm-14/lib/libclang.so.1",
                 "/usr/lib/libclang.so",
             ]
-            found_path = None
-            for path in libclang_paths:
-                if os.path.exists(path):
-                    found_path = path
-                    break
+            found_path = findLibclang(libclang_paths)
             if found_path:
                 clang.cindex.Config.set_library_file(found_path)
             else:
@@ -1217,50 +1529,53 @@ def main():
         print("Please ensure LLVM/Clang is installed correctly and its location is known to the system (e.g., in your PATH).")
         sys.exit(1)
 
-    index = clang.cindex.Index.create()
-
-    # Arguments passed to clang for parsing
-    args = [
-        "-x", "c++",
-        "-std=c++17",
-        "-D__CODE_GENERATOR__",
-        "-DIMGUI_DISABLE_OBSOLETE_FUNCTIONS",
-    ]
-    if os.name != "nt":
-        args.extend(["-I/usr/include", "-I/usr/include/x86_64-linux-gnu"])
-
-    translation_unit = index.parse(sFilename, args)
-
-    if not translation_unit:
-        print("Failed to parse the translation unit.")
+    outDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "generated")
+    if not os.path.exists(outDir):
+        os.mkdir(outDir)
+
+    # Reuse the AstNode tree of the last run if nothing it depends on changed
+    cachePath = os.path.join(outDir, ast_cache_file)
+    useCache = os.environ.get("IMGUIGEN_NO_CACHE") != "1"
+    root = loadAstCache(cachePath, sFilename) if useCache else None
+    if root is None:
+        index = clang.cindex.Index.create()
+
+        # Arguments passed to clang for parsing
+        args = [
+            "-x", "c++-header",
+            "-fsyntax-only",
+            "-std=c++17",
+            "-D__CODE_GENERATOR__",
+            "-DIMGUI_DISABLE_OBSOLETE_FUNCTIONS",
+        ]
+        if os.name != "nt":
+            args.extend(["-I/usr/include", "-I/usr/include/x86_64-linux-gnu"])
+
+        translation_unit = index.parse(sFilename, args, options=tu_parse_options)
+
+        if not translation_unit:
+            print("Failed to parse the translation unit.")
+            for diag in translation_unit.diagnostics:
+                print(diag)
+            sys.exit(1)
+
+        # Check for parsing errors
+        has_errors = False
         for diag in translation_unit.diagnostics:
-            print(diag)
-        sys.exit(1)
-
-    # Check for parsing errors
-    has_errors = False
-    for diag in translation_unit.diagnostics:
-        if diag.severity >= clang.cindex.Diagnostic.Error:
-            print(f"Clang Error: {diag.spelling} at {diag.location}")
-            has_errors = True
-    if has_errors:
-        print("Clang reported errors while parsing. The generated files may be incorrect.")
+            if diag.severity >= clang.cindex.Diagnostic.Error:
+                print(f"Clang Error: {diag.spelling} at {diag.location}")
+                has_errors = True
+        if has_errors:
+            print("Clang reported errors while parsing. The generated files may be incorrect.")
+
+        root = build_ast(translation_unit.cursor, sFilename)
+        # don't let the cache hide the errors on the next runs
+        if useCache and not has_errors:
+            sourceFiles = [sFilename] + sorted(set(i.include.name for i in translation_unit.get_includes()))
+            saveAstCache(cachePath, sourceFiles, root)
 
     # Kick off the generation process
-    BindingGenerator(debug).generate(translation_unit.cursor, sFilename)
-
-    # Post-process the generated FFI header to replace all instances of ImVec types
-    outDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "generated")
-    file_path = os.path.join(outDir, "imgui_gen.h")
-    content = ""
-    with open(file_path, "r", encoding='utf-8') as f:
-        content = f.read()
-
-    content = re.sub(r"\bImVec2\b", "ImVec2_C", content)
-    content = re.sub(r"\bImVec4\b", "ImVec4_C", content)
-
-    with open(file_path, "w", encoding='utf-8') as f:
-        f.write(content)
+    BindingGenerator(debug).generate(root, sFilename)
 
     print("SUCCESS!")
     print("Output files are located in the 'generated/' directory.")